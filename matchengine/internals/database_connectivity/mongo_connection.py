@@ -45,7 +45,9 @@ class DefaultDBSecrets(DBSecrets):
                        rw_password=self._secrets.get("MONGO_PASSWORD", False),
                        replica_set=self._secrets.get("MONGO_REPLICASET", False),
                        max_pool_size=self._secrets.get("MONGO_MAX_POOL_SIZE", False, ),
-                       min_pool_size=self._secrets.get("MONGO_MIN_POOL_SIZE", False))
+                       min_pool_size=self._secrets.get("MONGO_MIN_POOL_SIZE", False),
+                       compressors=self._secrets.get("MONGO_COMPRESSORS", False),
+                       wait_queue_timeout_ms=self._secrets.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", False))
 
 
 class MongoDBConnection(object):
@@ -55,16 +57,18 @@ class MongoDBConnection(object):
     db: Union[pymongo.database.Database, motor.motor_asyncio.AsyncIOMotorDatabase]
     client: Union[pymongo.MongoClient, motor.motor_asyncio.AsyncIOMotorClient]
 
-    def __init__(self, read_only=True, db=None, async_init=True):
+    def __init__(self, read_only=True, db=None, async_init=True, max_pool_size=None):
         """
         Default params to use values from an external SECRETS.JSON configuration file,
 
         Override SECRETS_JSON values if arguments are passed via CLI
         :param read_only:
         :param db:
+        :param max_pool_size: used when MONGO_MAX_POOL_SIZE is not set in secrets
         """
         self.read_only = read_only
         self.async_init = async_init
+        self.max_pool_size = max_pool_size
 
         if not hasattr(self, 'secrets'):
             self.secrets = DefaultDBSecrets().get_secrets()
@@ -78,10 +82,15 @@ class MongoDBConnection(object):
             uri_params.append(f"authSource={self.secrets.AUTH_DB}")
         if self.secrets.REPLICA_SET:
             uri_params.append(f"replicaSet={self.secrets.REPLICA_SET}")
-        if self.secrets.MAX_POOL_SIZE:
-            uri_params.append(f"maxPoolSize={self.secrets.MAX_POOL_SIZE}")
+        max_pool_size = self.secrets.MAX_POOL_SIZE or self.max_pool_size
+        if max_pool_size:
+            uri_params.append(f"maxPoolSize={max_pool_size}")
         if self.secrets.MIN_POOL_SIZE:
             uri_params.append(f"minPoolSize={self.secrets.MIN_POOL_SIZE}")
+        if self.secrets.COMPRESSORS:
+            uri_params.append(f"compressors={self.secrets.COMPRESSORS}")
+        if self.secrets.WAIT_QUEUE_TIMEOUT_MS:
+            uri_params.append(f"waitQueueTimeoutMS={self.secrets.WAIT_QUEUE_TIMEOUT_MS}")
         username_password_param = (f"{username if username else str()}"
                                    f"{':' if username and password else str()}"
                                    f"{password if password else str()}"
@@ -30,7 +30,8 @@ from matchengine.internals.typing.matchengine_types import (
     UpdateTask,
     RunLogUpdateTask,
     CheckIndicesTask,
-    IndexUpdateTask
+    IndexUpdateTask,
+    TrialMatch
 )
 from matchengine.internals.utilities.object_comparison import nested_object_hash
 from matchengine.internals.utilities.query import (
@@ -47,7 +48,8 @@ from matchengine.internals.utilities.task_utils import (
 )
 from matchengine.internals.utilities.update_match_utils import async_update_matches_by_protocol_no
 from matchengine.internals.utilities.utilities import (
-    find_plugins)
+    find_plugins,
+    get_sort_order)
 
 if TYPE_CHECKING:
     from typing import (
@@ -65,9 +67,10 @@ if TYPE_CHECKING:
         ObjectId,
         Trial,
         QueryNode,
-        TrialMatch,
         Task,
-        QueryNodeContainer
+        QueryNodeContainer,
+        MatchClauseData,
+        MatchCriterion
     )
 
 logging.basicConfig(level=logging.INFO)
@@ -146,7 +149,10 @@ class MatchEngine(object):
             exit_after_drop: bool = False,
             drop_accept: bool = False,
             resource_dirs: List = None,
-            chunk_size: int = 1000
+            chunk_size: int = 1000,
+            flush_batch_size: int = 100,
+            worker_batch_size: int = 1,
+            trial_match_batch_size: int = 1000
     ):
         self.resource_dirs = list()
         self.resource_dirs.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ref'))
@@ -155,13 +161,17 @@ class MatchEngine(object):
         self.trial_match_collection = trial_match_collection
         self.starttime = datetime.datetime.now()
         self.run_id = uuid.uuid4()
+        self.run_id_hex = self.run_id.hex
         self.run_log_entries = dict()
         self.ignore_run_log = ignore_run_log
         self.skip_run_log_entry = skip_run_log_entry
-        self.clinical_run_log_entries = dict()
+        self.clinical_run_log_entries: Dict[str, Set[ClinicalID]] = defaultdict(set)
         self._protocol_nos_param = list(protocol_nos) if protocol_nos is not None else protocol_nos
         self._sample_ids_param = list(sample_ids) if sample_ids is not None else sample_ids
         self.chunk_size = chunk_size
+        self.flush_batch_size = flush_batch_size
+        self.worker_batch_size = worker_batch_size
+        self.trial_match_batch_size = trial_match_batch_size
 
         if config.__class__ is str:
             with open(config) as config_file_handle:
@@ -252,6 +262,9 @@ class MatchEngine(object):
         if asyncio.get_event_loop().is_closed():
             asyncio.set_event_loop(asyncio.new_event_loop())
         self._loop = asyncio.get_event_loop()
+        # tasks whose awaits resolve immediately finish without a scheduler hop (python 3.12+)
+        if hasattr(asyncio, 'eager_task_factory'):
+            self._loop.set_task_factory(asyncio.eager_task_factory)
         self._loop.run_until_complete(self._async_init(db_name))
 
     def check_run_log_flags(self,
@@ -291,9 +304,12 @@ class MatchEngine(object):
         Create a task que which holds all matching and update tasks for processing via workers.
         """
         self._task_q = asyncio.queues.Queue()
-        self._async_db_ro = MongoDBConnection(read_only=True, db=db_name)
+        # let the async pools grow to several connections per worker rather than queueing behind motor's
+        # default cap of 100; connections are only opened on demand (minPoolSize is set via secrets)
+        max_pool_size = max(100, self.num_workers * 4)
+        self._async_db_ro = MongoDBConnection(read_only=True, db=db_name, max_pool_size=max_pool_size)
         self.async_db_ro = self._async_db_ro.__enter__()
-        self._async_db_rw = MongoDBConnection(read_only=False, db=db_name)
+        self._async_db_rw = MongoDBConnection(read_only=False, db=db_name, max_pool_size=max_pool_size)
         self.async_db_rw = self._async_db_rw.__enter__()
         self._workers = {
             worker_id: self._loop.create_task(self._queue_worker(worker_id))
@@ -360,28 +376,35 @@ class MatchEngine(object):
         Function which executes tasks placed on the task queue.
         """
         while True:
-            # Execute update task
-            task: Task = await self._task_q.get()
-            args = (self, task, worker_id)
-            task_class = task.__class__
-            if task_class is PoisonPill:
-                await run_poison_pill(*args)
-                break
+            # Wait for one task, then take up to worker_batch_size - 1 more which are already queued.
+            # A PoisonPill always ends the batch so that each worker receives exactly one.
+            tasks: List[Task] = [await self._task_q.get()]
+            while (len(tasks) < self.worker_batch_size
+                   and tasks[-1].__class__ is not PoisonPill
+                   and not self._task_q.empty()):
+                tasks.append(self._task_q.get_nowait())
+
+            for task in tasks:
+                args = (self, task, worker_id)
+                task_class = task.__class__
+                if task_class is PoisonPill:
+                    await run_poison_pill(*args)
+                    return
 
-            elif task_class is QueryTask:
-                await run_query_task(*args)
+                elif task_class is QueryTask:
+                    await run_query_task(*args)
 
-            elif task_class is UpdateTask:
-                await run_update_task(*args)
+                elif task_class is UpdateTask:
+                    await run_update_task(*args)
 
-            elif task_class is RunLogUpdateTask:
-                await run_run_log_update_task(*args)
+                elif task_class is RunLogUpdateTask:
+                    await run_run_log_update_task(*args)
 
-            elif task_class is CheckIndicesTask:
-                await run_check_indices_task(*args)
+                elif task_class is CheckIndicesTask:
+                    await run_check_indices_task(*args)
 
-            elif task_class is IndexUpdateTask:
-                await run_index_update_task(*args)
+                elif task_class is IndexUpdateTask:
+                    await run_index_update_task(*args)
 
     def query_node_transform(self, query_node: QueryNode) -> NoReturn:
         """Stub function to be overriden by plugin"""
@@ -593,7 +616,7 @@ class MatchEngine(object):
         self.run_log_entries[protocol_no] = {
             'protocol_no': protocol_no,
             'clinical_ids': run_log_clinical_ids_new,
-            'run_id': self.run_id.hex,
+            'run_id': self.run_id_hex,
             'run_params': {
                 'trials': self._protocol_nos_param,
                 'sample_ids': self._sample_ids_param,
@@ -689,51 +712,69 @@ class MatchEngine(object):
         self._clinical_ids_for_protocol_cache[protocol_no] = clinical_ids_to_run
         return self._clinical_ids_for_protocol_cache[protocol_no]
 
-    def pre_process_trial_matches(self, trial_match: TrialMatch) -> Dict:
+    def get_trial_match_proto(self,
+                              trial: Trial,
+                              match_clause_data: MatchClauseData,
+                              match_criterion: MatchCriterion) -> Dict:
+        """
+        Function which returns the required trial_match fields that are the same for every match reason
+        of a single query against a single match clause
+        """
+        trial_match_proto = {
+            'match_level': match_clause_data.match_clause_level,
+            'internal_id': match_clause_data.internal_id,
+            'code': match_clause_data.code,
+            'trial_curation_level_status': 'closed' if match_clause_data.is_suspended else 'open',
+            'trial_summary_status': match_clause_data.status,
+            'coordinating_center': match_clause_data.coordinating_center,
+            'query_hash': match_criterion.hash()
+        }
+
+        # add trial fields except for extras
+        trial_match_proto.update({
+            k: v
+            for k, v in trial.items()
+            if k not in {'treatment_list', '_summary', 'status', '_id', '_elasticsearch', 'match'}
+        })
+
+        trial_match_proto.update(
+            {'match_path': '.'.join(
+                [str(item) for item in match_clause_data.parent_path])})
+
+        trial_match_proto['combo_coord'] = nested_object_hash(
+            {
+                'query_hash': trial_match_proto['query_hash'],
+                'match_path': trial_match_proto['match_path'],
+                'protocol_no': trial_match_proto['protocol_no']
+            })
+
+        trial_match_proto['is_disabled'] = False
+        return trial_match_proto
+
+    def pre_process_trial_matches(self, trial_match: TrialMatch, trial_match_proto: Dict = None) -> Dict:
         """
-        Function which returns required fields for trial_match documents
+        Function which returns required fields for trial_match documents.
+        trial_match_proto may be passed in when it has already been computed for the trial match's query
         """
+        if trial_match_proto is None:
+            trial_match_proto = self.get_trial_match_proto(trial_match.trial,
+                                                           trial_match.match_clause_data,
+                                                           trial_match.match_criterion)
 
         new_trial_match = dict()
         clinical_doc = self.cache.docs[trial_match.match_reason.clinical_id]
         new_trial_match.update(self.format_trial_match_k_v(clinical_doc))
-        new_trial_match['clinical_id'] = self.cache.docs[trial_match.match_reason.clinical_id][
-            '_id']
+        new_trial_match['clinical_id'] = clinical_doc['_id']
 
         new_trial_match.update(
             {
-                'match_level': trial_match.match_clause_data.match_clause_level,
-                'internal_id': trial_match.match_clause_data.internal_id,
                 'reason_type': trial_match.match_reason.reason_name,
                 'q_depth': trial_match.match_reason.depth,
                 'q_width': trial_match.match_reason.width,
-                'code': trial_match.match_clause_data.code,
-                'trial_curation_level_status': 'closed' if trial_match.match_clause_data.is_suspended else 'open',
-                'trial_summary_status': trial_match.match_clause_data.status,
-                'coordinating_center': trial_match.match_clause_data.coordinating_center,
-                'show_in_ui': trial_match.match_reason.show_in_ui,
-                'query_hash': trial_match.match_criterion.hash()
+                'show_in_ui': trial_match.match_reason.show_in_ui
             })
+        new_trial_match.update(trial_match_proto)
 
-        # add trial fields except for extras
-        new_trial_match.update({
-            k: v
-            for k, v in trial_match.trial.items()
-            if k not in {'treatment_list', '_summary', 'status', '_id', '_elasticsearch', 'match'}
-        })
-
-        new_trial_match.update(
-            {'match_path': '.'.join(
-                [str(item) for item in trial_match.match_clause_data.parent_path])})
-
-        new_trial_match['combo_coord'] = nested_object_hash(
-            {
-                'query_hash': new_trial_match['query_hash'],
-                'match_path': new_trial_match['match_path'],
-                'protocol_no': new_trial_match['protocol_no']
-            })
-
-        new_trial_match['is_disabled'] = False
         new_trial_match.pop("_updated", None)
         new_trial_match.pop("last_updated", None)
         return new_trial_match
@@ -745,6 +786,47 @@ class MatchEngine(object):
         """Stub function to be overriden by plugin"""
         return dict()
 
+    def create_trial_matches_batch(self,
+                                   trial: Trial,
+                                   match_clause_data: MatchClauseData,
+                                   match_criterion: MatchCriterion,
+                                   multi_collection_query: MultiCollectionQuery,
+                                   match_reasons: Iterable[MatchReason],
+                                   starttime: datetime.datetime) -> List[Tuple[str, Dict]]:
+        """
+        Create trial match documents for match reasons returned by a single query.
+        Values which are the same for every document in the batch are looked up once.
+        Returns a list of (sample_id, trial match document) pairs.
+        """
+        sort_map = self.config['trial_match_sorting']
+        pre_process_trial_matches = self.pre_process_trial_matches
+        create_trial_matches = self.create_trial_matches
+        trial_match_proto = self.get_trial_match_proto(trial, match_clause_data, match_criterion)
+        debug = self.debug
+        pairs = list()
+        for result in match_reasons:
+            self._queue_task_count += 1
+            if debug and self._queue_task_count % 1000 == 0:
+                log.info(f"Trial match count: {self._queue_task_count}")
+            match_context_data = TrialMatch(trial,
+                                            match_clause_data,
+                                            match_criterion,
+                                            multi_collection_query,
+                                            result,
+                                            starttime)
+
+            # allow user to extend trial_match objects in plugin functions
+            # generate required fields on trial match doc before
+            # generate sort_order and hash fields after all fields are added
+            new_match_proto = pre_process_trial_matches(match_context_data, trial_match_proto)
+            match_document = create_trial_matches(match_context_data, new_match_proto)
+            match_document['sort_order'] = get_sort_order(sort_map, match_document)
+            to_hash = {key: match_document[key] for key in match_document if key not in {'hash', 'is_disabled'}}
+            match_document['hash'] = nested_object_hash(to_hash)
+            match_document['_me_id'] = self.run_id_hex
+            pairs.append((match_document['sample_id'], match_document))
+        return pairs
+
     def results_transformer(self, results: Dict[ClinicalID, List[MatchReason]]):
         """Stub function to be overriden by plugin"""
 
@@ -41,15 +41,15 @@ class CheckIndicesTask(object):
 
 class IndexUpdateTask(object):
     __slots__ = (
-        "collection", "index"
+        "collection", "indices"
     )
 
     def __init__(
             self,
             collection: str,
-            index: str
+            indices: List[str]
     ):
-        self.index = index
+        self.indices = indices
         self.collection = collection
 
 
@@ -76,16 +76,18 @@ class QueryTask(object):
 
 class UpdateTask(object):
     __slots__ = (
-        "ops", "protocol_no"
+        "ops", "protocol_no", "documents"
     )
 
     def __init__(
             self,
             ops: List,
-            protocol_no: str
+            protocol_no: str,
+            documents: List[Dict] = None
     ):
         self.ops = ops
         self.protocol_no = protocol_no
+        self.documents = documents if documents is not None else list()
 
 
 class RunLogUpdateTask(object):
@@ -468,7 +470,8 @@ class Secrets(object):
         "HOST", "PORT", "DB",
         "AUTH_DB", "RO_USERNAME", "RO_PASSWORD",
         "RW_USERNAME", "RW_PASSWORD", "REPLICA_SET",
-        "MAX_POOL_SIZE", "MIN_POOL_SIZE"
+        "MAX_POOL_SIZE", "MIN_POOL_SIZE", "COMPRESSORS",
+        "WAIT_QUEUE_TIMEOUT_MS"
     )
 
     def __init__(
@@ -483,8 +486,12 @@ class Secrets(object):
             rw_password: str,
             replica_set: str,
             max_pool_size: str,
-            min_pool_size: str
+            min_pool_size: str,
+            compressors: str = False,
+            wait_queue_timeout_ms: str = False
     ):
+        self.WAIT_QUEUE_TIMEOUT_MS = wait_queue_timeout_ms
+        self.COMPRESSORS = compressors
         self.MIN_POOL_SIZE = min_pool_size
         self.MAX_POOL_SIZE = max_pool_size
         self.REPLICA_SET = replica_set
@@ -5,7 +5,7 @@ import datetime
 import logging
 from typing import TYPE_CHECKING
 
-from pymongo import UpdateMany, InsertOne
+from pymongo import UpdateMany
 
 from matchengine.internals.typing.matchengine_types import RunLogUpdateTask, UpdateTask, MongoQuery
 from matchengine.internals.utilities.utilities import perform_db_call
@@ -48,6 +48,9 @@ async def async_update_matches_by_protocol_no(matchengine: MatchEngine, protocol
             delete_ops = await get_delete_ops(matches_to_disable)
             matchengine.task_q.put_nowait(UpdateTask(delete_ops, protocol_no))
 
+    # coalesce per-sample writes into fewer, larger UpdateTasks
+    pending_ops = list()
+    pending_documents = list()
     for sample_id in matches_by_sample_id.keys():
         if not matchengine.drop:
             new_matches_hashes = [match['hash'] for match in matches_by_sample_id[sample_id]]
@@ -71,12 +74,18 @@ async def async_update_matches_by_protocol_no(matchengine: MatchEngine, protocol
             matches_to_mark_available = [m for m in matches_by_sample_id[sample_id] if
                                          m['hash'] in disabled]
             ops = get_update_operations(matches_to_disable,
-                                        matches_to_insert,
                                         matches_to_mark_available)
         else:
-            ops = [InsertOne(document=trial_match) for trial_match in
-                   matches_by_sample_id[sample_id]]
-        matchengine.task_q.put_nowait(UpdateTask(ops, protocol_no))
+            ops = list()
+            matches_to_insert = matches_by_sample_id[sample_id]
+        pending_ops.extend(ops)
+        pending_documents.extend(matches_to_insert)
+        if len(pending_ops) + len(pending_documents) >= matchengine.flush_batch_size:
+            matchengine.task_q.put_nowait(UpdateTask(pending_ops, protocol_no, pending_documents))
+            pending_ops = list()
+            pending_documents = list()
+    if pending_ops or pending_documents:
+        matchengine.task_q.put_nowait(UpdateTask(pending_ops, protocol_no, pending_documents))
 
     if not matchengine.skip_run_log_entry:
         matchengine.task_q.put_nowait(RunLogUpdateTask(protocol_no))
@@ -150,16 +159,16 @@ async def get_matches_to_disable(matchengine: MatchEngine,
 
 
 def get_update_operations(matches_to_disable: list,
-                          matches_to_insert: list,
                           matches_to_mark_available: list) -> list:
+    """
+    New matches are not included; they are sent to the db as raw documents via UpdateTask.documents
+    """
     ops = list()
     updated_time = datetime.datetime.now()
     disable_hashes = [trial_match['hash'] for trial_match in matches_to_disable]
     ops.append(UpdateMany(filter={'hash': {'$in': disable_hashes}},
                           update={'$set': {'is_disabled': True,
                                            '_updated': updated_time}}))
-    for to_insert in matches_to_insert:
-        ops.append(InsertOne(document=to_insert))
 
     available_hashes = [trial_match['hash'] for trial_match in matches_to_mark_available]
     ops.append(UpdateMany(filter={'hash': {'$in': available_hashes}},
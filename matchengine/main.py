@@ -31,7 +31,11 @@ def main(run_args):
             drop=run_args.drop or run_args.drop_and_exit,
             drop_accept=run_args.confirm_drop,
             exit_after_drop=run_args.drop_and_exit,
-            resource_dirs=run_args.extra_resource_dirs
+            resource_dirs=run_args.extra_resource_dirs,
+            chunk_size=run_args.chunk_size[0],
+            flush_batch_size=run_args.flush_batch_size[0],
+            worker_batch_size=run_args.worker_batch_size[0],
+            trial_match_batch_size=run_args.trial_match_batch_size[0]
     ) as me:
         me.get_matches_for_all_trials()
         if not args.dry:
@@ -41,6 +45,16 @@ def main(run_args):
             me.create_output_csv()
 
 
+def positive_int(value):
+    """
+    argparse type for sizes which must be at least 1
+    """
+    size = int(value)
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return size
+
+
 if __name__ == "__main__":
     param_trials_help = ('Path to your trial data file or a directory containing a file for each trial.'
                          'Default expected format is YML.')
@@ -120,6 +134,15 @@ if __name__ == "__main__":
     subp_p.add_argument("--drop-confirm", dest="confirm_drop", action="store_true", default=False,
                         help="Confirm you wish --drop; skips confirmation prompt")
     subp_p.add_argument("--workers", nargs=1, type=int, default=[cpu_count() * 5])
+    subp_p.add_argument("--chunk-size", dest="chunk_size", nargs=1, type=positive_int, default=[1000],
+                        help="Maximum number of operations sent in each concurrent bulk write")
+    subp_p.add_argument("--flush-batch-size", dest="flush_batch_size", nargs=1, type=positive_int, default=[100],
+                        help="Number of pending trial match writes to accumulate before queueing an update")
+    subp_p.add_argument("--worker-batch-size", dest="worker_batch_size", nargs=1, type=positive_int, default=[1],
+                        help="Maximum number of already-queued tasks a worker takes each time it wakes up")
+    subp_p.add_argument("--trial-match-batch-size", dest="trial_match_batch_size", nargs=1, type=positive_int,
+                        default=[1000],
+                        help="Number of trial match documents a query task builds before yielding to other workers")
     subp_p.add_argument('--db', dest='db_name', default=None, required=False, help=db_name_help)
     subp_p.add_argument('--o', dest="csv_output", action="store_true", default=False, required=False,
                         help=csv_output_help)
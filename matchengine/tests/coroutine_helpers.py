@@ -0,0 +1,21 @@
+import asyncio
+
+
+def run_coroutine(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def coroutine_returning(value=None):
+    """
+    Build a coroutine function which ignores its arguments and returns value,
+    for stubbing awaited calls without unittest.mock.AsyncMock (python 3.8+)
+    """
+
+    async def stub(*args, **kwargs):
+        return value
+
+    return stub
@@ -0,0 +1,114 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, call
+
+from pymongo.errors import AutoReconnect, CursorNotFound, ServerSelectionTimeoutError
+
+from matchengine.internals.typing.matchengine_types import RunLogUpdateTask, CheckIndicesTask
+from matchengine.internals.utilities.task_utils import (
+    retry_on_reconnect,
+    run_run_log_update_task,
+    run_check_indices_task,
+    run_query_task
+)
+from matchengine.tests.coroutine_helpers import run_coroutine, coroutine_returning
+
+
+class TestRetryOnReconnect(TestCase):
+    """Task accounting of handlers wrapped by retry_on_reconnect, using a mocked matchengine and task queue"""
+
+    def setUp(self) -> None:
+        self.me = MagicMock()
+        self.me.debug = False
+        self.task = object()
+
+    def test_retryable_error_requeues_then_marks_done_once(self):
+        for error_class in (AutoReconnect, CursorNotFound, ServerSelectionTimeoutError):
+            with self.subTest(error_class=error_class.__name__):
+                self.me.reset_mock()
+
+                @retry_on_reconnect
+                async def handler(matchengine, task, worker_id):
+                    raise error_class("connection lost")
+
+                run_coroutine(handler(self.me, self.task, 0))
+                assert self.me.task_q.mock_calls == [call.put_nowait(self.task), call.task_done()]
+                self.me.loop.stop.assert_not_called()
+
+    def test_fatal_error_stops_loop_and_reraises(self):
+        @retry_on_reconnect
+        async def handler(matchengine, task, worker_id):
+            raise ValueError("bad document")
+
+        with self.assertRaises(ValueError):
+            run_coroutine(handler(self.me, self.task, 0))
+        self.me.loop.stop.assert_called_once_with()
+        self.me.task_q.put_nowait.assert_not_called()
+        self.me.task_q.task_done.assert_called_once_with()
+
+    def test_success_marks_done_once(self):
+        @retry_on_reconnect
+        async def handler(matchengine, task, worker_id):
+            return None
+
+        run_coroutine(handler(self.me, self.task, 0))
+        assert self.me.task_q.mock_calls == [call.task_done()]
+
+    def test_run_log_update_early_return_marks_done(self):
+        self.me.trial_match_collection = "trial_match"
+        self.me.trials_to_match_on = set()
+        run_coroutine(run_run_log_update_task(self.me, RunLogUpdateTask("10-001"), 0))
+        assert self.me.task_q.mock_calls == [call.task_done()]
+        self.me.async_db_rw.get_collection.assert_not_called()
+
+
+class TestCheckIndices(TestCase):
+
+    def test_run_history_clinical_id_index_is_created(self):
+        me = MagicMock()
+        me.debug = False
+        me.trial_match_collection = "trial_match_test"
+        me.config = {'indices': {'clinical': ['SAMPLE_ID'], 'trial_match': ['hash']}}
+        existing = {
+            'clinical': [{'key': {'_id': 1}}, {'key': {'SAMPLE_ID': 1}}],
+            'trial_match_test': [{'key': {'_id': 1}}],
+            'clinical_run_history_trial_match_test': []
+        }
+        me.async_db_ro.__getitem__.side_effect = lambda collection: MagicMock(
+            list_indexes=MagicMock(return_value=MagicMock(to_list=coroutine_returning(existing[collection]))))
+
+        run_coroutine(run_check_indices_task(me, CheckIndicesTask(), 0))
+
+        queued = {task.collection: task.indices for (task,), _ in me.task_q.put_nowait.call_args_list}
+        assert queued == {'trial_match_test': ['hash'],
+                          'clinical_run_history_trial_match_test': ['clinical_id']}
+        assert me.config['indices'] == {'clinical': ['SAMPLE_ID'], 'trial_match': ['hash']}
+        me.task_q.task_done.assert_called_once_with()
+
+
+class TestQueryTaskBatching(TestCase):
+
+    def test_documents_built_in_batches_of_match_reasons(self):
+        me = MagicMock()
+        me.debug = False
+        me.matches = dict()
+        me.trial_match_batch_size = 4
+        results = {f"clinical_{idx}": [f"reason_{idx}_{reason_idx}" for reason_idx in range(idx)] for idx in range(5)}
+        me.run_query = coroutine_returning(results)
+        batches = list()
+
+        def create_trial_matches_batch(trial, match_clause_data, match_path, query, match_reasons, starttime):
+            batches.append(list(match_reasons))
+            return [(reason.split('_')[1], {'reason': reason}) for reason in match_reasons]
+
+        me.create_trial_matches_batch.side_effect = create_trial_matches_batch
+        task = MagicMock(trial={'protocol_no': '10-001'})
+        run_coroutine(run_query_task(me, task, 0))
+
+        # 10 match reasons across 5 clinical ids are batched by document count, not by clinical id
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert [reason for batch in batches for reason in batch] == [
+            reason for reasons in results.values() for reason in reasons]
+        assert {sample_id: [match['reason'] for match in matches]
+                for sample_id, matches in me.matches['10-001'].items()} == {
+            str(idx): results[f"clinical_{idx}"] for idx in range(1, 5)}
+        me.task_q.task_done.assert_called_once_with()
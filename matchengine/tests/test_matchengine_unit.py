@@ -1,7 +1,9 @@
+import asyncio
 import glob
 import json
 import os
 from unittest import TestCase
+from unittest.mock import patch
 
 from matchengine.internals.engine import MatchEngine
 from matchengine.internals.match_criteria_transform import MatchCriteriaTransform
@@ -9,6 +11,8 @@ from matchengine.internals.match_translator import create_match_tree, get_match_
     translate_match_path
 from matchengine.internals.typing.matchengine_types import MatchClause, MatchCriteria, MatchCriterion
 from matchengine.internals.typing.matchengine_types import MatchClauseData, ParentPath, MatchClauseLevel
+from matchengine.internals.typing.matchengine_types import PoisonPill, UpdateTask
+from matchengine.internals.typing.matchengine_types import Cache, ClinicalMatchReason, TrialMatch
 from matchengine.internals.utilities.object_comparison import nested_object_hash
 from matchengine.internals.utilities.utilities import find_plugins
 
@@ -218,3 +222,145 @@ class TestMatchEngine(TestCase):
             },
             "4": [9, 8]
         })
+
+
+class TestQueueWorker(TestCase):
+    """Workers taking several queued tasks per wake-up must still shut down on exactly one PoisonPill each"""
+
+    def setUp(self) -> None:
+        self.me = MatchEngine.__new__(MatchEngine)
+        self.me.debug = False
+        self.me.worker_batch_size = 4
+        self.loop = asyncio.new_event_loop()
+        self.me._loop = self.loop
+        self.handled = list()
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    async def fake_update_task(self, matchengine, task, worker_id):
+        self.handled.append((worker_id, task))
+        matchengine.task_q.task_done()
+
+    def test_poison_pill_ends_batch(self):
+        async def run():
+            self.me._task_q = asyncio.Queue()
+            updates = [UpdateTask(list(), "10-001"), UpdateTask(list(), "10-002")]
+            for task in updates + [PoisonPill(), PoisonPill()]:
+                self.me._task_q.put_nowait(task)
+
+            with patch('matchengine.internals.engine.run_update_task', self.fake_update_task):
+                await self.me._queue_worker(0)
+                # worker 0 handled both updates and one pill, leaving the second pill for another worker
+                assert self.handled == [(0, updates[0]), (0, updates[1])]
+                assert self.me._task_q.qsize() == 1
+                await self.me._queue_worker(1)
+            assert self.me._task_q.empty()
+            await asyncio.wait_for(self.me._task_q.join(), 1)
+
+        self.loop.run_until_complete(run())
+
+    def test_each_worker_gets_one_pill(self):
+        async def run():
+            self.me._task_q = asyncio.Queue()
+            workers = [self.loop.create_task(self.me._queue_worker(worker_id)) for worker_id in range(3)]
+            await asyncio.sleep(0)
+            for _ in workers:
+                self.me._task_q.put_nowait(PoisonPill())
+            await asyncio.wait_for(asyncio.gather(*workers), 1)
+            await asyncio.wait_for(self.me._task_q.join(), 1)
+
+        self.loop.run_until_complete(run())
+
+
+def legacy_pre_process_trial_matches(matchengine: MatchEngine, trial_match: TrialMatch):
+    """Per-result trial match fields as built before the shared per-query proto was introduced"""
+    new_trial_match = dict()
+    clinical_doc = matchengine.cache.docs[trial_match.match_reason.clinical_id]
+    new_trial_match.update(matchengine.format_trial_match_k_v(clinical_doc))
+    new_trial_match['clinical_id'] = matchengine.cache.docs[trial_match.match_reason.clinical_id]['_id']
+    new_trial_match.update(
+        {
+            'match_level': trial_match.match_clause_data.match_clause_level,
+            'internal_id': trial_match.match_clause_data.internal_id,
+            'reason_type': trial_match.match_reason.reason_name,
+            'q_depth': trial_match.match_reason.depth,
+            'q_width': trial_match.match_reason.width,
+            'code': trial_match.match_clause_data.code,
+            'trial_curation_level_status': 'closed' if trial_match.match_clause_data.is_suspended else 'open',
+            'trial_summary_status': trial_match.match_clause_data.status,
+            'coordinating_center': trial_match.match_clause_data.coordinating_center,
+            'show_in_ui': trial_match.match_reason.show_in_ui,
+            'query_hash': trial_match.match_criterion.hash()
+        })
+    new_trial_match.update({
+        k: v
+        for k, v in trial_match.trial.items()
+        if k not in {'treatment_list', '_summary', 'status', '_id', '_elasticsearch', 'match'}
+    })
+    new_trial_match.update(
+        {'match_path': '.'.join([str(item) for item in trial_match.match_clause_data.parent_path])})
+    new_trial_match['combo_coord'] = nested_object_hash(
+        {
+            'query_hash': new_trial_match['query_hash'],
+            'match_path': new_trial_match['match_path'],
+            'protocol_no': new_trial_match['protocol_no']
+        })
+    new_trial_match['is_disabled'] = False
+    new_trial_match.pop("_updated", None)
+    new_trial_match.pop("last_updated", None)
+    return new_trial_match
+
+
+class TestTrialMatchProto(TestCase):
+    """Trial match fields built from the shared per-query proto must match the per-result fields"""
+
+    def setUp(self) -> None:
+        self.me = MatchEngine.__new__(MatchEngine)
+        self.me.cache = Cache()
+        self.me.cache.docs['clinical_1'] = {
+            '_id': 'clinical_1',
+            'SAMPLE_ID': 'sample_1',
+            'PROTOCOL_NO': 'from clinical',
+            'ONCOTREE_PRIMARY_DIAGNOSIS_NAME': 'Melanoma',
+            '_updated': 'from clinical',
+            'last_updated': 'from clinical'
+        }
+        self.match_clause_data = MatchClauseData(match_clause=[{'clinical': {'age_numerical': '>=18'}}],
+                                                 internal_id='internal_1',
+                                                 code='clause code',
+                                                 coordinating_center='center',
+                                                 is_suspended=True,
+                                                 status='open to accrual',
+                                                 parent_path=ParentPath(('treatment_list', 'step', 0, 'match', 0)),
+                                                 match_clause_level=MatchClauseLevel('step'),
+                                                 match_clause_additional_attributes=dict(),
+                                                 protocol_no='10-001')
+        self.match_criterion = MatchCriterion([MatchCriteria({'clinical': {'age_numerical': '>=18'}}, 0, 0)])
+        self.match_reason = ClinicalMatchReason(None, 'clinical_1', 2, True)
+
+    def assert_same_trial_match(self, trial):
+        trial_match = TrialMatch(trial, self.match_clause_data, self.match_criterion, None, self.match_reason, None)
+        expected = legacy_pre_process_trial_matches(self.me, trial_match)
+        trial_match_proto = self.me.get_trial_match_proto(trial, self.match_clause_data, self.match_criterion)
+        for actual in (self.me.pre_process_trial_matches(trial_match),
+                       self.me.pre_process_trial_matches(trial_match, trial_match_proto)):
+            assert actual == expected
+            assert nested_object_hash(actual) == nested_object_hash(expected)
+        return expected
+
+    def test_matches_per_result_fields(self):
+        trial = {'_id': 'trial_1', 'protocol_no': '10-001', 'status': 'open', 'treatment_list': {}, 'nct_id': 'NCT1'}
+        trial_match = self.assert_same_trial_match(trial)
+        assert trial_match['code'] == 'clause code'
+        assert trial_match['protocol_no'] == '10-001'
+        assert 'last_updated' not in trial_match and '_updated' not in trial_match
+
+    def test_trial_keys_take_precedence(self):
+        trial = {'_id': 'trial_1', 'protocol_no': '10-001', 'code': 'trial code', 'show_in_ui': False,
+                 'sample_id': 'from trial', '_updated': 'from trial'}
+        trial_match = self.assert_same_trial_match(trial)
+        assert trial_match['code'] == 'trial code'
+        assert trial_match['show_in_ui'] is False
+        assert trial_match['sample_id'] == 'from trial'
+        assert '_updated' not in trial_match
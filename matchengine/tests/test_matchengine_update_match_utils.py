@@ -0,0 +1,59 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from matchengine.internals.typing.matchengine_types import RunLogUpdateTask, UpdateTask
+from matchengine.internals.utilities.update_match_utils import async_update_matches_by_protocol_no
+from matchengine.tests.coroutine_helpers import run_coroutine, coroutine_returning
+
+
+class TestUpdateBatching(TestCase):
+    """Per-sample trial match writes are coalesced into UpdateTasks of about flush_batch_size operations"""
+
+    def setUp(self) -> None:
+        self.protocol_no = "10-001"
+        self.me = MagicMock()
+        self.me.drop = False
+        self.me.skip_run_log_entry = False
+        self.me.flush_batch_size = 7
+        self.me.task_q.join = coroutine_returning()
+        self.me.matches = {
+            self.protocol_no: {
+                f"sample_{sample_idx}": [{'hash': f"hash_{sample_idx}_{match_idx}", 'sample_id': f"sample_{sample_idx}"}
+                                         for match_idx in range(sample_idx % 4)]
+                for sample_idx in range(24)
+            }
+        }
+        self.me.sample_mapping = {sample_id: sample_id for sample_id in self.me.matches[self.protocol_no]}
+
+    def run_update(self):
+        module = 'matchengine.internals.utilities.update_match_utils'
+        with patch(f'{module}.get_all_except', coroutine_returning(list())), \
+                patch(f'{module}.get_existing_matches', coroutine_returning(list())), \
+                patch(f'{module}.get_matches_to_disable', coroutine_returning(list())):
+            run_coroutine(async_update_matches_by_protocol_no(self.me, self.protocol_no))
+        return [task for (task,), _ in self.me.task_q.put_nowait.call_args_list]
+
+    def test_every_op_and_document_queued_exactly_once(self):
+        queued = self.run_update()
+        update_tasks = [task for task in queued if task.__class__ is UpdateTask]
+        # the first task disables matches for samples with no new matches; the rest are coalesced
+        coalesced = update_tasks[1:]
+
+        documents = [document['hash'] for task in coalesced for document in task.documents]
+        expected = [match['hash'] for matches in self.me.matches[self.protocol_no].values() for match in matches]
+        assert sorted(documents) == sorted(expected)
+        assert len(documents) == len(set(documents))
+
+        # each sample contributes one disable and one mark-available UpdateMany
+        assert sum(len(task.ops) for task in coalesced) == 2 * len(self.me.matches[self.protocol_no])
+        for task in coalesced[:-1]:
+            assert len(task.ops) + len(task.documents) >= self.me.flush_batch_size
+        assert 0 < len(coalesced[-1].ops) + len(coalesced[-1].documents)
+
+    def test_remainder_queued_before_run_log_update(self):
+        queued = self.run_update()
+        assert queued[-1].__class__ is RunLogUpdateTask
+        assert all(task.__class__ is UpdateTask for task in queued[:-1])
+        # the last sample leaves fewer than flush_batch_size pending writes, which must still be flushed
+        remainder = queued[-2]
+        assert 0 < len(remainder.ops) + len(remainder.documents) < self.me.flush_batch_size